@@ -1,8 +1,8 @@
 import streamlit as st
-from td_dp_lib import DataLib
-import plotly.express as px
+from td_dp_lib import DataLib, Song
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
 import os
 from dotenv import load_dotenv
 import spotipy
@@ -18,8 +18,122 @@ spotify_client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
 # Initialize Spotify API
 spotify = spotipy.Spotify(auth_manager=SpotifyClientCredentials(client_id=spotify_client_id, client_secret=spotify_client_secret))
 
-# Initialize the data library
-db = DataLib(uri)
+# Initialize the data library once per server process
+@st.cache_resource
+def get_db():
+    return DataLib(uri)
+
+# Cached queries so reruns don't go back to MongoDB
+@st.cache_data(ttl=300)
+def cached_unique_artists():
+    return get_db().get_unique_artists()
+
+@st.cache_data(ttl=300)
+def cached_distrokid_artists():
+    return get_db().get_distrokid_artists()
+
+@st.cache_data(ttl=300)
+def cached_song_titles_by_author(author):
+    return get_db().get_song_titles_by_author(author)
+
+@st.cache_data(ttl=300)
+def cached_song(title, author):
+    # Return a plain dict from the cache; the Song object is rebuilt by the caller
+    song = get_db().get_song(title, author)
+    return song.to_dict() if song else None
+
+def get_song(title, author):
+    data = cached_song(title, author)
+    return Song(data, data['all_occurrences']) if data else None
+
+# Cached Spotify lookups so reruns don't repeat REST round trips
+@st.cache_data(ttl=3600)
+def spotify_artist_tracks(artist):
+    # One request returns up to 50 of the artist's tracks, covering most song clicks
+    results = spotify.search(q=f"artist:{artist}", type='track', limit=50)
+    tracks = {}
+    for track in results['tracks']['items']:
+        # The artist filter is fuzzy; keep only exact artist matches, first (most relevant) hit wins
+        if any(a['name'].lower() == artist.lower() for a in track['artists']):
+            tracks.setdefault(track['name'].lower(), track)
+    return tracks
+
+@st.cache_data(ttl=3600)
+def spotify_track(song, artist):
+    track = spotify_artist_tracks(artist).get(song.lower())
+    if track is None:
+        results = spotify.search(q=f"track:{song} artist:{artist}", type='track', limit=1)
+        items = results['tracks']['items']
+        track = items[0] if items else None
+    return track
+
+# Plotly config shared by all charts
+PLOTLY_CONFIG = {"staticPlot": False, "responsive": True}
+
+# Maximum number of points sent to the browser per time-series chart
+MAX_CHART_POINTS = 1500
+
+def lttb(x, y, threshold=MAX_CHART_POINTS):
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets, keeping its visual shape.
+    Points are treated as evenly spaced along x.
+
+    :param x: array-like, the x values
+    :param y: array-like, the y values
+    :param threshold: int, the maximum number of points to keep
+    :return: tuple, the downsampled x and y as numpy arrays
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    pos = np.arange(n, dtype=float)
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = pos[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs((pos[a] - avg_x) * (y[start:end] - y[a]) - (pos[a] - pos[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return x[selected], y[selected]
+
+def line_chart(x, y, x_label, y_label, title):
+    # WebGL trace so the GPU rasterizes long series instead of the SVG renderer
+    fig = go.Figure(go.Scattergl(x=x, y=y, mode='lines'))
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label, transition_duration=0)
+    return fig
+
+@st.cache_data(max_entries=100)
+def build_radar(song_id, features):
+    # Closed polygon: repeat the first feature at the end
+    categories = [name for name, _ in features]
+    values = [value for _, value in features]
+    radar_fig = go.Figure(data=go.Scatterpolar(
+        r=values + values[:1],
+        theta=categories + categories[:1],
+        fill='toself'
+    ))
+    radar_fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 1]
+            )),
+        showlegend=False,
+        title='Song Features',
+        transition_duration=0,
+        uirevision=song_id
+    )
+    return radar_fig
 
 # Streamlit App
 st.title('A&R Dashboard')
@@ -47,59 +161,61 @@ st.sidebar.header("Artists")
 
 # Get unique artists
 if filter_distrokid:
-    unique_artists = [artist for artist in db.get_unique_artists() if any(song.distrokid for song in db.get_songs_by_author(artist))]
+    unique_artists = cached_distrokid_artists()
 else:
-    unique_artists = db.get_unique_artists()
+    unique_artists = cached_unique_artists()
 
 artist_selected = st.sidebar.selectbox('Select an artist', unique_artists)
 
 # Placeholder for artist-specific songs
 st.sidebar.header(f"Songs by {artist_selected}")
 
-# Get unique songs for the selected artist
-songs_by_artist = db.get_songs_by_author(artist_selected)
-song_titles = [song.title for song in songs_by_artist]
+# Get unique song titles for the selected artist
+song_titles = cached_song_titles_by_author(artist_selected)
 
-# Display song titles as buttons
-selected_song = None
-for song_title in song_titles:
-    if st.sidebar.button(song_title):
-        selected_song = song_title
+# Display song titles as a single radio widget
+selected_song = st.sidebar.radio('Songs', song_titles, index=None)
 
 # Main Page
 if selected_song:
     st.header(f"Graphs for {selected_song}")
     
-    # Get the selected song data
-    song_data = next((song for song in songs_by_artist if song.title == selected_song), None)
+    # Get the selected song data, reusing it from session state until the selection changes
+    song_key = (artist_selected, selected_song)
+    if st.session_state.get('selected_song_key') != song_key:
+        st.session_state['selected_song_key'] = song_key
+        st.session_state['selected_song_data'] = get_song(selected_song, artist_selected)
+    song_data = st.session_state['selected_song_data']
     
     if song_data:
         # Graph of the past seven days
         latest_occurrence = song_data.all_occurrences[-1]
         past_seven_days_graph = latest_occurrence['graph_values'][::-1]
         x_labels = list(range(-7, 0))
-        fig1 = px.line(x=x_labels, y=past_seven_days_graph, labels={'x': 'Day', 'y': 'Value'}, title='Past 7 Days Graph')
-        st.plotly_chart(fig1)
+        fig1 = line_chart(x_labels, past_seven_days_graph, 'Day', 'Value', 'Past 7 Days Graph')
+        st.plotly_chart(fig1, config=PLOTLY_CONFIG)
         
+        # Build the occurrence history once and extract columns from it
+        occ_df = pd.DataFrame(song_data.all_occurrences).reindex(columns=['timestamp', 'popularity', 'viewCount'])
+
         # Graph of all available popularity data
-        popularity_data = [occurrence['popularity'] for occurrence in song_data.all_occurrences if 'popularity' in occurrence]
-        popularity_dates = [occurrence['timestamp'] for occurrence in song_data.all_occurrences if 'popularity' in occurrence]
-        fig2 = px.line(x=popularity_dates, y=popularity_data, labels={'x': 'Date', 'y': 'Popularity'}, title='Popularity Over Time')
-        st.plotly_chart(fig2)
+        pop = occ_df.dropna(subset=['popularity'])
+        pop_dates, pop_values = lttb(pop['timestamp'], pop['popularity'])
+        fig2 = line_chart(pop_dates, pop_values, 'Date', 'Popularity', 'Popularity Over Time')
+        st.plotly_chart(fig2, config=PLOTLY_CONFIG)
         
         # Graph of all available view counts
-        view_counts = [occurrence['viewCount'] for occurrence in song_data.all_occurrences if 'viewCount' in occurrence and occurrence['viewCount'] is not None]
-        view_count_dates = [occurrence['timestamp'] for occurrence in song_data.all_occurrences if 'viewCount' in occurrence and occurrence['viewCount'] is not None]
-        if view_counts and view_count_dates:  # Ensure there is data to plot
-            fig3 = px.line(x=view_count_dates, y=view_counts, labels={'x': 'Date', 'y': 'View Count'}, title='View Count Over Time')
-            st.plotly_chart(fig3)
+        vc = occ_df.dropna(subset=['viewCount'])
+        if not vc.empty:  # Ensure there is data to plot
+            vc_dates, vc_values = lttb(vc['timestamp'], vc['viewCount'])
+            fig3 = line_chart(vc_dates, vc_values, 'Date', 'View Count', 'View Count Over Time')
+            st.plotly_chart(fig3, config=PLOTLY_CONFIG)
         else:
             st.write("No view count data available for this song.")
         
         # Fetch song details from Spotify
-        search_results = spotify.search(q=f"track:{selected_song} artist:{artist_selected}", type='track')
-        if search_results['tracks']['items']:
-            track = search_results['tracks']['items'][0]
+        track = spotify_track(selected_song, artist_selected)
+        if track:
             album_cover_url = track['album']['images'][0]['url']
             artist_image_url = None
             if 'images' in track['artists'][0] and track['artists'][0]['images']:
@@ -127,24 +243,8 @@ if selected_song:
             "Valence": song_data.valence,
         }
 
-        categories = list(features.keys())
-        values = list(features.values())
-        
-        radar_fig = go.Figure(data=go.Scatterpolar(
-            r=values + values[:1],
-            theta=categories + categories[:1],
-            fill='toself'
-        ))
-        radar_fig.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 1]
-                )),
-            showlegend=False,
-            title='Song Features'
-        )
-        st.plotly_chart(radar_fig)
+        radar_fig = build_radar(song_data.id, tuple(features.items()))
+        st.plotly_chart(radar_fig, config=PLOTLY_CONFIG)
         
         # Display additional song information
         st.subheader("Song Details")
@@ -1,10 +1,74 @@
 import os
-import json
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
+from bson import ObjectId
 import pandas as pd
 from datetime import datetime
 
+# Per-song fields taken from the first occurrence when aggregating
+_SONG_FIELDS = [
+    'title', 'author', 'acousticness', 'danceability', 'energy', 'instrumentalness',
+    'liveness', 'speechiness', 'valence', 'popularity', 'album', 'release_date',
+    'duration_ms', 'distrokid', 'timestamp', 'note'
+]
+
+# Projection for chart views, skipping large blobs such as trackedVideo.description
+_PROJ_FULL = {
+    **{field: 1 for field in _SONG_FIELDS},
+    'graph_values': 1,
+    'viewCount': 1,
+    'trackedVideo.viewCount': 1
+}
+
+# Occurrence fields needed for the per-song time-series charts
+_PROJ_OCC = {'graph_values': 1, 'popularity': 1, 'viewCount': 1, 'timestamp': 1}
+
+# Documents fetched per round trip when streaming cursors
+_BATCH_SIZE = 500
+
+# Files parsed and inserted in parallel by upload_json_files
+_UPLOAD_WORKERS = 8
+
+# Shared MongoClients keyed by connection string, reused by every DataLib instance
+_clients = {}
+
+# Connection strings whose collection indexes have already been ensured
+_indexed = set()
+
+def _get_client(connection_string):
+    """
+    Return the process-wide MongoClient for a connection string, creating it on first use.
+
+    :param connection_string: str, the connection string for MongoDB Atlas
+    :return: MongoClient, the shared client
+    """
+    if connection_string not in _clients:
+        _clients[connection_string] = MongoClient(connection_string, server_api=ServerApi('1'), maxPoolSize=50)
+    return _clients[connection_string]
+
+def _object_id(song_id):
+    """
+    Convert a song ID to the ObjectId stored in the collection when possible.
+
+    :param song_id: str or ObjectId, the ID of the song
+    :return: ObjectId, or the original value if it is not a valid ObjectId
+    """
+    return ObjectId(song_id) if ObjectId.is_valid(song_id) else song_id
+
+def _to_dataframe(records):
+    """
+    Build a DataFrame from MongoDB documents with the _id column as strings.
+
+    :param records: iterable of dict, the documents (a cursor is consumed lazily)
+    :return: pd.DataFrame, the documents as a pandas DataFrame
+    """
+    df = pd.DataFrame.from_records(records)
+    if '_id' in df:
+        df['_id'] = df['_id'].astype(str)
+    return df
+
 class Song:
     def __init__(self, data, all_occurrences):
         """
@@ -44,6 +108,36 @@ class Song:
         """
         return self.all_occurrences[index]['graph_values'] if self.all_occurrences else []
 
+    def to_dict(self):
+        """
+        Return the song as a plain dict in the same shape accepted by the constructor.
+
+        :return: dict, the song data including its occurrences
+        """
+        return {
+            '_id': self.id,
+            'title': self.title,
+            'author': self.author,
+            'graph_values': self.graph_values,
+            'acousticness': self.acousticness,
+            'danceability': self.danceability,
+            'energy': self.energy,
+            'instrumentalness': self.instrumentalness,
+            'liveness': self.liveness,
+            'speechiness': self.speechiness,
+            'valence': self.valence,
+            'popularity': self.popularity,
+            'album': self.album,
+            'release_date': self.release_date,
+            'duration_ms': self.duration_ms,
+            'distrokid': self.distrokid,
+            'trackedVideo': self.trackedVideo,
+            'viewCount': self.viewCount,
+            'timestamp': self.timestamp,
+            'note': self.note,
+            'all_occurrences': self.all_occurrences
+        }
+
     def __repr__(self):
         return f"Song(ID={self.id}, Title={self.title}, Author={self.author})"
 
@@ -54,17 +148,39 @@ class DataLib:
 
         :param connection_string: str, the connection string for MongoDB Atlas
         """
-        self.client = MongoClient(connection_string, server_api=ServerApi('1'))
+        self.client = _get_client(connection_string)
         self.db_name = 'music_trends'  # Hardcoded database name
         self.collection_name = 'daily_trends'  # Hardcoded collection name
         self.db = self.client[self.db_name]
 
-        # Test the connection
+        # Test the connection (opt-in, it costs a synchronous round trip)
+        if os.getenv('DAKOTA_PING'):
+            try:
+                self.client.admin.command('ping')
+                print("Pinged your deployment. You successfully connected to MongoDB!")
+            except Exception as e:
+                print(f"An error occurred: {e}")
+
+        # Create indexes once per shared client rather than on every construction
+        if connection_string not in _indexed and self.ensure_indexes():
+            _indexed.add(connection_string)
+
+    def ensure_indexes(self):
+        """
+        Create the indexes used by the hot queries. Safe to call repeatedly.
+
+        :return: bool, True if the indexes were created or already existed
+        """
+        collection = self.db[self.collection_name]
         try:
-            self.client.admin.command('ping')
-            print("Pinged your deployment. You successfully connected to MongoDB!")
+            collection.create_index('author')
+            collection.create_index('timestamp')
+            collection.create_index([('title', 1), ('author', 1)])
+            collection.create_index([('distrokid', 1), ('author', 1)])
+            return True
         except Exception as e:
-            print(f"An error occurred: {e}")
+            print(f"An error occurred while creating indexes: {e}")
+            return False
 
     def upload_data(self, data):
         """
@@ -79,7 +195,7 @@ class DataLib:
                 item['viewCount'] = item['trackedVideo']['viewCount']
             else:
                 item['viewCount'] = None
-        collection.insert_many(data)
+        collection.insert_many(data, ordered=False)
         print(f"Inserted {len(data)} documents into the collection {self.collection_name}")
 
     def get_song_data(self):
@@ -89,11 +205,9 @@ class DataLib:
         :return: pd.DataFrame, the song data as a pandas DataFrame
         """
         collection = self.db[self.collection_name]
-        data = list(collection.find())
+        data = collection.find(projection=_PROJ_FULL).batch_size(_BATCH_SIZE)
         # Convert the _id field to a string
-        for record in data:
-            record['_id'] = str(record['_id'])
-        return pd.DataFrame(data)
+        return _to_dataframe(data)
 
     def get_song_by_id(self, song_id):
         """
@@ -103,9 +217,54 @@ class DataLib:
         :return: Song, the song data
         """
         collection = self.db[self.collection_name]
-        song_data = collection.find_one({'_id': song_id})
-        all_occurrences = list(collection.find({'title': song_data['title'], 'author': song_data['author']}))
-        return Song(song_data, all_occurrences) if song_data else None
+        song_data = collection.find_one({'_id': _object_id(song_id)}, projection=_PROJ_FULL)
+        if not song_data:
+            return None
+        all_occurrences = list(collection.find({'title': song_data['title'], 'author': song_data['author']}, projection=_PROJ_OCC).sort('timestamp', 1))
+        return Song(song_data, all_occurrences)
+
+    def _aggregate_songs(self, match):
+        """
+        Aggregate song occurrences matching a query by title and author.
+
+        :param match: dict, the query selecting the occurrences to aggregate
+        :return: list of Song, the list of aggregated songs
+        """
+        collection = self.db[self.collection_name]
+        pipeline = [
+            {'$match': match},
+            {'$project': _PROJ_FULL},
+            {'$sort': {'timestamp': 1}},
+            {'$group': {
+                '_id': {'title': '$title', 'author': '$author'},
+                'song_id': {'$first': '$_id'},
+                **{field: {'$first': f'${field}'} for field in _SONG_FIELDS},
+                'trackedVideo': {'$first': {'$ifNull': ['$trackedVideo', {}]}},
+                'all_occurrences': {'$push': '$$ROOT'}
+            }},
+            {'$sort': {'_id.title': 1, '_id.author': 1}},
+            # Element-wise max of graph_values across all occurrences
+            {'$set': {
+                '_id': {'$toString': '$song_id'},
+                'viewCount': '$trackedVideo.viewCount',
+                'graph_values': {'$reduce': {
+                    'input': '$all_occurrences.graph_values',
+                    'initialValue': None,
+                    'in': {'$cond': [
+                        {'$eq': ['$$value', None]},
+                        '$$this',
+                        {'$map': {
+                            'input': {'$zip': {'inputs': ['$$value', '$$this']}},
+                            'as': 'pair',
+                            'in': {'$max': '$$pair'}
+                        }}
+                    ]}
+                }}
+            }},
+            {'$unset': 'song_id'}
+        ]
+        cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=_BATCH_SIZE)
+        return [Song(data, data['all_occurrences']) for data in cursor]
 
     def get_songs_by_name(self, title):
         """
@@ -114,45 +273,7 @@ class DataLib:
         :param title: str, the title of the song to retrieve
         :return: list of Song, the list of aggregated songs with the given title
         """
-        collection = self.db[self.collection_name]
-        song_data = list(collection.find({'title': title}))
-
-        # Aggregate songs by title and author
-        aggregated_data = {}
-        for data in song_data:
-            key = (data['title'], data['author'])
-            if key not in aggregated_data:
-                aggregated_data[key] = {
-                    '_id': str(data['_id']),
-                    'title': data['title'],
-                    'author': data['author'],
-                    'graph_values': data['graph_values'],
-                    'acousticness': data['acousticness'],
-                    'danceability': data['danceability'],
-                    'energy': data['energy'],
-                    'instrumentalness': data['instrumentalness'],
-                    'liveness': data['liveness'],
-                    'speechiness': data['speechiness'],
-                    'valence': data['valence'],
-                    'popularity': data['popularity'],
-                    'album': data['album'],
-                    'release_date': data['release_date'],
-                    'duration_ms': data['duration_ms'],
-                    'distrokid': data['distrokid'],
-                    'trackedVideo': data.get('trackedVideo', {}),
-                    'viewCount': data.get('trackedVideo', {}).get('viewCount', None),
-                    'timestamp': data['timestamp'],
-                    'note': data.get('note'),
-                    'all_occurrences': [data]
-                }
-            else:
-                # Aggregate graph values
-                aggregated_data[key]['graph_values'] = [
-                    max(a, b) for a, b in zip(aggregated_data[key]['graph_values'], data['graph_values'])
-                ]
-                aggregated_data[key]['all_occurrences'].append(data)
-
-        return [Song(data, data['all_occurrences']) for data in aggregated_data.values()]
+        return self._aggregate_songs({'title': title})
 
     def get_songs_by_author(self, author):
         """
@@ -161,45 +282,33 @@ class DataLib:
         :param author: str, the author of the song to retrieve
         :return: list of Song, the list of aggregated songs by the given author
         """
-        collection = self.db[self.collection_name]
-        song_data = list(collection.find({'author': author}))
-
-        # Aggregate songs by title and author
-        aggregated_data = {}
-        for data in song_data:
-            key = (data['title'], data['author'])
-            if key not in aggregated_data:
-                aggregated_data[key] = {
-                    '_id': str(data['_id']),
-                    'title': data['title'],
-                    'author': data['author'],
-                    'graph_values': data['graph_values'],
-                    'acousticness': data['acousticness'],
-                    'danceability': data['danceability'],
-                    'energy': data['energy'],
-                    'instrumentalness': data['instrumentalness'],
-                    'liveness': data['liveness'],
-                    'speechiness': data['speechiness'],
-                    'valence': data['valence'],
-                    'popularity': data['popularity'],
-                    'album': data['album'],
-                    'release_date': data['release_date'],
-                    'duration_ms': data['duration_ms'],
-                    'distrokid': data['distrokid'],
-                    'trackedVideo': data.get('trackedVideo', {}),
-                    'viewCount': data.get('trackedVideo', {}).get('viewCount', None),
-                    'timestamp': data['timestamp'],
-                    'note': data.get('note'),
-                    'all_occurrences': [data]
-                }
-            else:
-                # Aggregate graph values
-                aggregated_data[key]['graph_values'] = [
-                    max(a, b) for a, b in zip(aggregated_data[key]['graph_values'], data['graph_values'])
-                ]
-                aggregated_data[key]['all_occurrences'].append(data)
+        return self._aggregate_songs({'author': author})
+
+    def get_song(self, title, author):
+        """
+        Retrieve a single aggregated song by title and author.
 
-        return [Song(data, data['all_occurrences']) for data in aggregated_data.values()]
+        :param title: str, the title of the song
+        :param author: str, the author of the song
+        :return: Song, the aggregated song, or None if not found
+        """
+        songs = self._aggregate_songs({'title': title, 'author': author})
+        return songs[0] if songs else None
+
+    def get_song_titles_by_author(self, author):
+        """
+        Retrieve the unique song titles by an author without loading chart data.
+
+        :param author: str, the author of the songs
+        :return: list, sorted unique song titles
+        """
+        collection = self.db[self.collection_name]
+        pipeline = [
+            {'$match': {'author': author}},
+            {'$group': {'_id': '$title'}},
+            {'$sort': {'_id': 1}}
+        ]
+        return [doc['_id'] for doc in collection.aggregate(pipeline)]
 
     def add_note_to_song(self, song_id, note):
         """
@@ -210,7 +319,7 @@ class DataLib:
         :return: str, confirmation message
         """
         collection = self.db[self.collection_name]
-        collection.update_one({'_id': song_id}, {'$set': {'note': note}})
+        collection.update_one({'_id': _object_id(song_id)}, {'$set': {'note': note}})
         return f'Note added to song with ID: {song_id}'
 
     def delete_song_by_id(self, song_id):
@@ -221,7 +330,7 @@ class DataLib:
         :return: str, confirmation message
         """
         collection = self.db[self.collection_name]
-        result = collection.delete_one({'_id': song_id})
+        result = collection.delete_one({'_id': _object_id(song_id)})
         if result.deleted_count:
             return f'Song with ID: {song_id} deleted successfully.'
         else:
@@ -247,35 +356,46 @@ class DataLib:
             print("Upload cancelled.")
             return
 
-        for file in json_files:
-            file_path = os.path.join(directory, file)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                file_data = json.load(f)
-                file_data['timestamp'] = file.split('_')[-1].replace('.json', '')
-                data_to_upload = [{
-                    'title': item['title'],
-                    'author': item['author'],
-                    'graph_values': item['graph_values'],
-                    'acousticness': item.get('acousticness'),
-                    'danceability': item.get('danceability'),
-                    'energy': item.get('energy'),
-                    'instrumentalness': item.get('instrumentalness'),
-                    'liveness': item.get('liveness'),
-                    'speechiness': item.get('speechiness'),
-                    'valence': item.get('valence'),
-                    'popularity': item.get('popularity'),
-                    'album': item.get('album'),
-                    'release_date': item.get('release_date'),
-                    'duration_ms': item.get('duration_ms'),
-                    'distrokid': item.get('distrokid'),
-                    'trackedVideo': item.get('trackedVideo', {}),
-                    'viewCount': item.get('trackedVideo', {}).get('viewCount', None),
-                    'timestamp': file_data['timestamp']
-                } for item in file_data['data']]
-                self.upload_data(data_to_upload)
+        # Parse and insert files concurrently; PyMongo releases the GIL on socket I/O
+        with ThreadPoolExecutor(max_workers=_UPLOAD_WORKERS) as executor:
+            list(executor.map(lambda file: self._upload_json_file(directory, file), json_files))
 
         print("All files have been uploaded successfully.")
 
+    def _upload_json_file(self, directory, file):
+        """
+        Parse a single trending music JSON file and upload its songs.
+
+        :param directory: str, the directory containing the file
+        :param file: str, the name of the JSON file
+        """
+        file_path = os.path.join(directory, file)
+        with open(file_path, 'rb') as f:
+            file_data = orjson.loads(f.read())
+        # Store the file date as a BSON date so range queries can use the timestamp index
+        file_data['timestamp'] = datetime.strptime(file.split('_')[-1].replace('.json', ''), '%Y-%m-%d')
+        data_to_upload = [{
+            'title': item['title'],
+            'author': item['author'],
+            'graph_values': item['graph_values'],
+            'acousticness': item.get('acousticness'),
+            'danceability': item.get('danceability'),
+            'energy': item.get('energy'),
+            'instrumentalness': item.get('instrumentalness'),
+            'liveness': item.get('liveness'),
+            'speechiness': item.get('speechiness'),
+            'valence': item.get('valence'),
+            'popularity': item.get('popularity'),
+            'album': item.get('album'),
+            'release_date': item.get('release_date'),
+            'duration_ms': item.get('duration_ms'),
+            'distrokid': item.get('distrokid'),
+            'trackedVideo': item.get('trackedVideo', {}),
+            'viewCount': item.get('trackedVideo', {}).get('viewCount', None),
+            'timestamp': file_data['timestamp']
+        } for item in file_data['data']]
+        self.upload_data(data_to_upload)
+
     def filter_by_date_range(self, start_date, end_date):
         """
         Retrieve songs within a specific date range.
@@ -287,10 +407,8 @@ class DataLib:
         collection = self.db[self.collection_name]
         start_date = datetime.strptime(start_date, '%Y-%m-%d')
         end_date = datetime.strptime(end_date, '%Y-%m-%d')
-        data = list(collection.find({'timestamp': {'$gte': start_date, '$lte': end_date}}))
-        for record in data:
-            record['_id'] = str(record['_id'])
-        return pd.DataFrame(data)
+        data = collection.find({'timestamp': {'$gte': start_date, '$lte': end_date}}, projection=_PROJ_FULL).batch_size(_BATCH_SIZE)
+        return _to_dataframe(data)
 
     def get_top_songs_comparison(self, date1, date2):
         """
@@ -301,12 +419,13 @@ class DataLib:
         :return: pd.DataFrame, a DataFrame with the top songs from both dates side by side
         """
         collection = self.db[self.collection_name]
-        data1 = list(collection.find({'timestamp': date1}))
-        data2 = list(collection.find({'timestamp': date2}))
-        df1 = pd.DataFrame(data1)
-        df2 = pd.DataFrame(data2)
-        df1['_id'] = df1['_id'].astype(str)
-        df2['_id'] = df2['_id'].astype(str)
+        timestamp1 = datetime.strptime(date1, '%Y-%m-%d')
+        timestamp2 = datetime.strptime(date2, '%Y-%m-%d')
+        # Match both BSON dates and legacy 'YYYY-MM-DD' strings until migrate_string_timestamps has run
+        data1 = collection.find({'timestamp': {'$in': [timestamp1, date1]}}, projection=_PROJ_FULL).batch_size(_BATCH_SIZE)
+        data2 = collection.find({'timestamp': {'$in': [timestamp2, date2]}}, projection=_PROJ_FULL).batch_size(_BATCH_SIZE)
+        df1 = _to_dataframe(data1)
+        df2 = _to_dataframe(data2)
         return pd.concat([df1, df2], axis=1, keys=[date1, date2])
 
     def get_unique_songs(self):
@@ -316,10 +435,8 @@ class DataLib:
         :return: pd.DataFrame, the unique song data as a pandas DataFrame
         """
         collection = self.db[self.collection_name]
-        data = list(collection.aggregate([{'$group': {'_id': {'title': '$title', 'author': '$author'}, 'unique_ids': {'$addToSet': '$_id'}, 'graph_values': {'$first': '$graph_values'}, 'timestamp': {'$first': '$timestamp'}}}]))
-        for record in data:
-            record['_id'] = str(record['_id'])
-        return pd.DataFrame(data)
+        data = collection.aggregate([{'$group': {'_id': {'title': '$title', 'author': '$author'}, 'unique_ids': {'$addToSet': '$_id'}, 'graph_values': {'$first': '$graph_values'}, 'timestamp': {'$first': '$timestamp'}}}], allowDiskUse=True, batchSize=_BATCH_SIZE)
+        return _to_dataframe(data)
 
     def get_unique_artists(self):
         """
@@ -328,8 +445,27 @@ class DataLib:
         :return: list, unique artist names
         """
         collection = self.db[self.collection_name]
-        artists = collection.distinct('author')
-        return sorted(artists)
+        # Sorting on author first lets the planner serve the $group from the author index
+        pipeline = [
+            {'$sort': {'author': 1}},
+            {'$group': {'_id': '$author'}},
+            {'$sort': {'_id': 1}}
+        ]
+        return [doc['_id'] for doc in collection.aggregate(pipeline, allowDiskUse=True)]
+
+    def get_distrokid_artists(self):
+        """
+        Retrieve artists that have at least one distrokid song.
+
+        :return: list, distrokid artist names
+        """
+        collection = self.db[self.collection_name]
+        pipeline = [
+            {'$match': {'distrokid': True}},
+            {'$group': {'_id': '$author'}},
+            {'$sort': {'_id': 1}}
+        ]
+        return [doc['_id'] for doc in collection.aggregate(pipeline)]
 
     def get_daily_top_songs(self, date):
         """
@@ -339,10 +475,10 @@ class DataLib:
         :return: pd.DataFrame, the song data for the specified date as a pandas DataFrame
         """
         collection = self.db[self.collection_name]
-        data = list(collection.find({'timestamp': date}))
-        for record in data:
-            record['_id'] = str(record['_id'])
-        return pd.DataFrame(data)
+        timestamp = datetime.strptime(date, '%Y-%m-%d')
+        # Match both BSON dates and legacy 'YYYY-MM-DD' strings until migrate_string_timestamps has run
+        data = collection.find({'timestamp': {'$in': [timestamp, date]}}, projection=_PROJ_FULL).batch_size(_BATCH_SIZE)
+        return _to_dataframe(data)
     
     def delete_all_songs(self):
         """
@@ -353,6 +489,20 @@ class DataLib:
         collection = self.db[self.collection_name]
         result = collection.delete_many({})
         return f'Deleted {result.deleted_count} songs from the collection.'
+
+    def migrate_string_timestamps(self):
+        """
+        Convert legacy 'YYYY-MM-DD' string timestamps to BSON dates in place.
+        Safe to run repeatedly; documents that already store dates are untouched.
+
+        :return: str, confirmation message
+        """
+        collection = self.db[self.collection_name]
+        result = collection.update_many(
+            {'timestamp': {'$type': 'string'}},
+            [{'$set': {'timestamp': {'$dateFromString': {'dateString': '$timestamp', 'format': '%Y-%m-%d'}}}}]
+        )
+        return f'Converted {result.modified_count} string timestamps to dates.'
         
     
 
@@ -364,6 +514,9 @@ if __name__ == "__main__":
     # Upload JSON files from the current directory
     db.upload_json_files()
 
+    # Convert timestamps stored as strings by older uploads
+    print(db.migrate_string_timestamps())
+
     # Retrieve data
     df = db.get_song_data()
     print(df)